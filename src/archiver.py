@@ -0,0 +1,439 @@
+# Stdlib modules
+import collections
+import concurrent.futures
+import io
+import json
+import os
+import struct
+import tarfile
+import time
+import zlib
+
+# Third-party modules
+# zstd is only needed for the "tar.zst" format, so it's optional.
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+
+ZSTD_AVAILABLE = zstd is not None
+
+# Archive formats supported by the ArchiveWriter.
+FORMATS = ("zip", "tar.zst")
+
+# Default limits used to roll over to a new archive (i.e: a new shard).
+MAX_FILES_PER_SHARD = 250
+MAX_BYTES_PER_SHARD = 512 * 1024 * 1024
+
+# ZIP archives are written without the ZIP64 extensions, so every shard
+# must stay below these limits.
+ZIP_MAX_FILES = 0xFFFF
+ZIP_MAX_BYTES = 0x7FFFFFFF
+
+
+class ArchiveWriter(object):
+    """Stream downloaded files into a set of rolling archives.
+
+    Every file is compressed on a pool of worker threads as soon as it's
+    added, and written into the open archive (i.e: the current shard) in
+    the same order it was added. Only a few files are kept in memory at
+    any time: once 'max_pending' files are waiting to be written, adding
+    a new one blocks until the oldest has been compressed and written.
+
+    A shard is sealed as soon as it reaches either 'max_files' or
+    'max_bytes', and the index file next to the archives is updated right
+    away. For every file, it stores the archive it lives in, the byte
+    offset of its data and the compressed/uncompressed sizes, so a single
+    animation can be extracted without reading the whole archive:
+
+    - zip: the offset points to the local file header of the member.
+    - tar.zst: every member is compressed as an independent zstd frame,
+      so the offset points to a frame that decompresses to the tar header
+      and data of that member only.
+    """
+    def __init__(self, path, fmt="zip", prefix="animations",
+                 max_files=MAX_FILES_PER_SHARD,
+                 max_bytes=MAX_BYTES_PER_SHARD, workers=None,
+                 max_pending=None, on_seal=None):
+        """Initialize the Archive Writer object.
+
+        :param path: Output folder path
+        :type path: str
+
+        :param fmt: Archive format ("zip" or "tar.zst")
+        :type fmt: str
+
+        :param prefix: Prefix used to name the archives and the index
+        :type prefix: str
+
+        :param max_files: Maximum number of files per archive
+        :type max_files: int
+
+        :param max_bytes: Maximum uncompressed bytes per archive
+        :type max_bytes: int
+
+        :param workers: Number of compression threads (None means auto)
+        :type workers: int
+
+        :param max_pending: Maximum number of files waiting to be written
+          (None means twice the number of workers)
+        :type max_pending: int
+
+        :param on_seal: Function called with the animation IDs of every
+          archive once it's been sealed (i.e: safely written to disk)
+        :type on_seal: callable
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported archive format: {fmt}")
+
+        if fmt == "tar.zst" and not ZSTD_AVAILABLE:
+            raise ValueError(
+                "The 'tar.zst' format needs Python 3.14+ or the "
+                "'zstandard' package.")
+
+        if fmt == "zip" and (max_files > ZIP_MAX_FILES
+                             or max_bytes > ZIP_MAX_BYTES):
+            raise ValueError("ZIP archives can't hold that many files/bytes.")
+
+        self.path = path or os.getcwd()
+        self.fmt = fmt
+        self.prefix = prefix
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        # Compression runs here, away from the download thread.
+        # Both zlib and zstd release the GIL while compressing.
+        workers = workers or os.cpu_count() or 1
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.max_pending = max_pending or workers * 2
+
+        # Files being compressed, in the order they have to be written.
+        self.pending = collections.deque()
+
+        # Names already used, so that no file is ever overwritten.
+        self.names = set()
+
+        # The shard currently open for writing and its contents.
+        self.shard = 0
+        self.file = None
+        self.archive_name = None
+        self.entries = []
+        self.shard_bytes = 0
+
+        # Number of files of every animation that aren't in a sealed shard
+        # yet (either waiting to be written or in the open shard).
+        self.unsealed = collections.Counter()
+        self.on_seal = on_seal
+
+        # Index entries of every sealed shard.
+        self.index = {}
+        self.index_path = os.path.join(self.path, f"{self.prefix}.index.json")
+
+    def add(self, name, data, anim_id=None):
+        """Queue a file to be compressed and written into the open archive.
+
+        If the name has already been used (e.g. two animations share the
+        same description), a counter is appended to it.
+
+        :param name: File name inside the archive
+        :type name: str
+
+        :param data: File content
+        :type data: bytes
+
+        :param anim_id: Animation ID to be stored in the index
+        :type anim_id: str
+
+        :return: Name the file has been given inside the archive
+        :rtype: str
+        """
+        name = self.get_unique_name(name)
+
+        if anim_id:
+            self.unsealed[anim_id] += 1
+
+        future = self.pool.submit(self.compress, name, data)
+        self.pending.append((name, anim_id, len(data), future))
+
+        # Don't let files pile up in memory if compression falls behind.
+        while len(self.pending) > self.max_pending:
+            self.write_next()
+
+        return name
+
+    def close(self):
+        """Write every pending file, seal the open archive and the index.
+
+        :return: Path to the index file
+        :rtype: str
+        """
+        try:
+            while self.pending:
+                self.write_next()
+
+            self.seal()
+
+        # If a file couldn't be compressed or written, keep the files that
+        # are already in the open archive, or remove it if that's not
+        # possible either, so no unreadable archive is left behind.
+        except BaseException:
+            self.seal_or_remove()
+            raise
+
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+        self.write_index()
+
+        return self.index_path
+
+    def get_unique_name(self, name):
+        """Append a counter to the name if it's already in use.
+
+        :param name: File name
+        :type name: str
+
+        :return: Unique file name
+        :rtype: str
+        """
+        stem, ext = os.path.splitext(name)
+        unique_name = name
+        counter = 2
+
+        while unique_name in self.names:
+            unique_name = f"{stem} ({counter}){ext}"
+            counter += 1
+
+        self.names.add(unique_name)
+
+        return unique_name
+
+    def compress(self, name, data):
+        """Compress a file (this runs on the worker threads).
+
+        :param name: File name inside the archive
+        :type name: str
+
+        :param data: File content
+        :type data: bytes
+
+        :return: Compressed data and its CRC-32 (only used by ZIP)
+        :rtype: tuple
+        """
+        if self.fmt == "zip":
+            # Raw deflate stream, as stored in ZIP archives.
+            compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+            compressed = compressor.compress(data) + compressor.flush()
+
+            return compressed, zlib.crc32(data)
+
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+
+        # Tar members are padded to a multiple of the block size.
+        padding = -len(data) % tarfile.BLOCKSIZE
+
+        member = io.BytesIO()
+        member.write(info.tobuf(tarfile.PAX_FORMAT))
+        member.write(data)
+        member.write(tarfile.NUL * padding)
+
+        return zstd.compress(member.getvalue()), None
+
+    def write_next(self):
+        """Write the oldest pending file into the open archive."""
+        name, anim_id, size, future = self.pending.popleft()
+
+        # Wait for the file to be compressed. This re-raises any exception
+        # that happened inside the worker thread.
+        compressed, crc = future.result()
+
+        if self.file is None:
+            self.open_shard()
+
+        offset = self.file.tell()
+
+        # The same modification time is used in both ZIP headers.
+        timestamp = self.get_dos_timestamp()
+
+        if self.fmt == "zip":
+            self.file.write(self.get_zip_header(
+                "<IHHHHHIIIHH", 0x04034b50, name, crc, timestamp,
+                len(compressed), size))
+            self.file.write(name.encode("utf-8"))
+
+        self.file.write(compressed)
+
+        entry = {
+            "archive": self.archive_name,
+            "offset": offset,
+            "length": len(compressed),
+            "size": size,
+        }
+
+        if anim_id:
+            entry["id"] = anim_id
+
+        self.entries.append((name, crc, timestamp, entry))
+        self.shard_bytes += size
+
+        # Roll over to a new shard as soon as any of the limits is reached.
+        if (len(self.entries) >= self.max_files
+                or self.shard_bytes >= self.max_bytes):
+            self.seal()
+
+    def open_shard(self):
+        """Open a new archive on disk."""
+        self.shard += 1
+        self.archive_name = f"{self.prefix}-{self.shard:04d}.{self.fmt}"
+        self.file = open(os.path.join(self.path, self.archive_name), "wb")
+        self.entries = []
+        self.shard_bytes = 0
+
+    def seal(self):
+        """Finish the open archive and add its files to the index."""
+        if self.file is None:
+            return
+
+        if self.fmt == "zip":
+            self.write_zip_directory()
+        else:
+            # End-of-archive marker: two empty blocks.
+            self.file.write(
+                zstd.compress(tarfile.NUL * tarfile.BLOCKSIZE * 2))
+
+        self.file.close()
+        self.file = None
+
+        anim_ids = []
+
+        for name, crc, timestamp, entry in self.entries:
+            self.index[name] = entry
+
+            if "id" in entry:
+                self.unsealed[entry["id"]] -= 1
+                anim_ids.append(entry["id"])
+
+        # Update the index as soon as a shard is done, so it's usable even
+        # if the program is closed before the rest of the shards.
+        self.write_index()
+
+        if self.on_seal:
+            self.on_seal(anim_ids)
+
+    def is_sealed(self, anim_id):
+        """Check if every file of an animation is in a sealed archive.
+
+        :param anim_id: Animation ID
+        :type anim_id: str
+
+        :return: True if no file of the animation is waiting to be sealed
+        :rtype: bool
+        """
+        return self.unsealed[anim_id] <= 0
+
+    def seal_or_remove(self):
+        """Seal the open archive, or remove it from disk if that fails."""
+        if self.file is None:
+            return
+
+        try:
+            self.seal()
+
+        except Exception:
+            self.file.close()
+            self.file = None
+            os.remove(os.path.join(self.path, self.archive_name))
+
+    def write_zip_directory(self):
+        """Write the ZIP central directory at the end of the open archive."""
+        start = self.file.tell()
+
+        for name, crc, timestamp, entry in self.entries:
+            header = self.get_zip_header(
+                "<IHHHHHHIIIHHHHHII", 0x02014b50, name, crc, timestamp,
+                entry["length"], entry["size"],
+                # Comment length, disk number, internal and external
+                # attributes (rw-r--r--) and local header offset.
+                0, 0, 0, 0o644 << 16, entry["offset"])
+
+            self.file.write(header)
+            self.file.write(name.encode("utf-8"))
+
+        size = self.file.tell() - start
+
+        # End of central directory record.
+        self.file.write(struct.pack(
+            "<IHHHHIIH", 0x06054b50, 0, 0, len(self.entries),
+            len(self.entries), size, start, 0))
+
+    def get_dos_timestamp(self):
+        """Get the current time in the MS-DOS format used by ZIP archives.
+
+        :return: MS-DOS time and date
+        :rtype: tuple
+        """
+        now = time.localtime()
+        dos_time = now.tm_hour << 11 | now.tm_min << 5 | now.tm_sec // 2
+        dos_date = (now.tm_year - 1980) << 9 | now.tm_mon << 5 | now.tm_mday
+
+        return dos_time, dos_date
+
+    def get_zip_header(self, fmt, signature, name, crc, timestamp, length,
+                       size, *extra):
+        """Pack a ZIP local file header or central directory header.
+
+        :param fmt: struct format of the header
+        :type fmt: str
+
+        :param signature: Header signature
+        :type signature: int
+
+        :param name: File name inside the archive
+        :type name: str
+
+        :param crc: CRC-32 of the uncompressed data
+        :type crc: int
+
+        :param timestamp: MS-DOS time and date (see 'get_dos_timestamp')
+        :type timestamp: tuple
+
+        :param length: Compressed size
+        :type length: int
+
+        :param size: Uncompressed size
+        :type size: int
+
+        :return: Packed header (without the file name)
+        :rtype: bytes
+        """
+        # Version 2.0, UTF-8 names (bit 11) and deflate compression (8).
+        fields = [signature, 20, 0x0800, 8, *timestamp, crc, length, size,
+                  len(name.encode("utf-8")), 0]
+
+        # Central directory headers have a 'version made by' field first.
+        if signature == 0x02014b50:
+            fields.insert(1, 20)
+
+        return struct.pack(fmt, *fields, *extra)
+
+    def write_index(self):
+        """Write the index of every sealed archive to disk.
+
+        The file is written to a temporary path first and then renamed, so
+        it never ends up half-written if the program is closed.
+        """
+        with open(f"{self.index_path}.tmp", "w") as file:
+            json.dump({"format": self.fmt, "files": self.index}, file,
+                      indent=2, sort_keys=True)
+
+        os.replace(f"{self.index_path}.tmp", self.index_path)
@@ -1,4 +1,8 @@
 # Stdlib modules
+import copy
+import datetime
+import hashlib
+import itertools
 import json
 import os
 import requests
@@ -7,6 +11,9 @@ import time
 # Third-party modules
 from PySide2 import QtCore, QtWebEngineWidgets, QtWidgets
 
+# Local modules
+from archiver import ArchiveWriter
+
 
 HEADERS = {
 "Accept": "application/json",
@@ -20,6 +27,75 @@ HEADERS = {
 session = requests.Session()
 
 
+class AuthenticationError(Exception):
+  """Raised when Mixamo rejects the access token (e.g. it has expired)."""
+
+# Maximum seconds to wait for Mixamo to export an animation.
+EXPORT_TIMEOUT = 5 * 60
+
+# Seconds to wait between sync passes. The wait doubles every time a pass
+# finds nothing new (or fails), up to the maximum, and is reset as soon as
+# something has been downloaded.
+SYNC_INTERVAL = 15 * 60
+SYNC_MAX_INTERVAL = 6 * 60 * 60
+
+# Seconds to wait for the UI to send a new access token once the current
+# one has expired.
+TOKEN_REFRESH_TIMEOUT = 30
+
+# Files written to the output folder when keeping the library in sync.
+SYNC_MANIFEST = "mixamo_sync.json"
+SYNC_HEALTH = "mixamo_sync_health.json"
+
+# Catalog fields used to tell whether an animation has changed in Mixamo.
+# Missing fields are simply ignored.
+SYNC_FINGERPRINT_KEYS = ("name", "description", "type", "motion_id",
+                         "updated_at")
+
+
+def parse_variant_grid(text):
+  """Parse a parameter grid typed by the user into a dictionary.
+
+  The expected format is one or more 'Name=value,value,...' entries
+  separated by semicolons. For example, "Emotion=0,50,100; Overdrive=0,50"
+  becomes {"emotion": [0, 50, 100], "overdrive": [0, 50]}.
+
+  Names are lower-cased and values are sorted without duplicates, so the
+  same grid always gives the same variants, no matter how it was typed.
+  Entries repeated for the same parameter are merged.
+
+  :param text: Parameter grid as typed by the user
+  :type text: str
+
+  :raises ValueError: If any entry isn't a name followed by integer values
+
+  :return: Parameter names and the values to sweep for each of them
+  :rtype: dict
+  """
+  grid = {}
+
+  for entry in (text or "").split(";"):
+    # Skip empty entries (e.g. a trailing semicolon).
+    if not entry.strip():
+      continue
+
+    # Don't silently ignore typos such as "Emotion 0,50,100".
+    if "=" not in entry:
+      raise ValueError(f"Missing '=' in variant entry: {entry.strip()}")
+
+    name, values = entry.split("=", 1)
+    name = name.strip().lower()
+    values = {int(val) for val in values.split(",") if val.strip()}
+
+    if not name or not values:
+      raise ValueError(
+        f"Missing name or values in variant entry: {entry.strip()}")
+
+    grid.setdefault(name, set()).update(values)
+
+  return {name: sorted(values) for name, values in sorted(grid.items())}
+
+
 class MixamoDownloader(QtCore.QObject):
   """Bulk download animations from Mixamo.
 
@@ -31,12 +107,25 @@ class MixamoDownloader(QtCore.QObject):
 
   The first step is to get the primary character ID and name.
 
+  If a parameter grid is given, every animation is exported once per
+  combination of the parameter values it supports (e.g. Emotion 0/50/100).
+
+  Animations are saved as separate FBX files unless an archive format
+  is given, in which case they're streamed into rolling archives instead
+  (see the ArchiveWriter class).
+
+  The "sync" mode keeps running until stopped, periodically downloading
+  only the animations that are new or have changed since the last pass
+  (see the 'sync_library' method).
+
 
   """
   # Create signals that will be used to emit info to the UI.
   finished = QtCore.Signal()
   total_tasks = QtCore.Signal(int)
   current_task = QtCore.Signal(int)
+  sync_status = QtCore.Signal(dict)
+  token_expired = QtCore.Signal()
 
   # Initialize a counter for the progress bar.
   task = 1
@@ -44,25 +133,56 @@ class MixamoDownloader(QtCore.QObject):
   # Initialize a flag that tells the code to stop.
   stop = False
 
-  def __init__(self, path, mode, query=None):
+  def __init__(self, path, mode, query=None, archive_format=None,
+               variant_grid=None):
     """Initialize the Mixamo Downloader object.
 
     :param path: Output folder path
     :type path: str
 
-    :param mode: Download mode ("all", "query" or "tpose")
+    :param mode: Download mode ("all", "query", "tpose" or "sync")
     :type mode: str
 
     :param query: Keyword to be used as query when searching animations
     :type query: str
+
+    :param archive_format: Archive format ("zip" or "tar.zst") or None
+    :type archive_format: str
+
+    :param variant_grid: Parameter names and values to sweep (see the
+      'parse_variant_grid' function)
+    :type variant_grid: dict
     """
     super().__init__()
 
     self.path = path
     self.mode = mode
     self.query = query
+    self.archive_format = archive_format
+    self.variant_grid = variant_grid or {}
+
+    # The archive writer is created when the worker starts running.
+    self.archive = None
+
+    # ID of the animation being downloaded (None for the T-Pose).
+    self.anim_id = None
+
+    # Total amount of tasks to be shown in the progress bar.
+    self.total = 0
 
   def run(self):
+    # DOWNLOAD MODE: SYNC
+    # This mode gets the primary character on every pass, so it's
+    # handled before anything else.
+    if self.mode == "sync":
+      # The 'finished' signal must always be emitted, otherwise the UI
+      # would never re-enable the 'Start download' button.
+      try:
+        self.sync_library()
+      finally:
+        self.finished.emit()
+      return
+
     # Get the primary character ID and name.
     character_id = self.get_primary_character_id()
     character_name = self.get_primary_character_name()
@@ -72,6 +192,30 @@ class MixamoDownloader(QtCore.QObject):
     if not character_id:
       return
 
+    # Stream the downloads into archives if the user asked for it.
+    if self.archive_format:
+      self.archive = ArchiveWriter(self.path, self.archive_format)
+
+    # Make sure that the archives and their index are written to disk,
+    # and the UI is told that the worker is done, even if something goes
+    # wrong in the middle of the download.
+    try:
+      self.download(character_id, character_name)
+    finally:
+      try:
+        self.close_archive()
+      finally:
+        self.finished.emit()
+
+  def download(self, character_id, character_name):
+    """Download the animations according to the download mode.
+
+    :param character_id: Primary character ID
+    :type character_id: str
+
+    :param character_name: Primary character name
+    :type character_name: str
+    """
     # DOWNLOAD MODE: TPOSE
     if self.mode == "tpose":
       # The total amount of tasks to process is 1.
@@ -86,9 +230,6 @@ class MixamoDownloader(QtCore.QObject):
       #print(f"Downloading T-Pose (with skin) for {character_name}...")
       self.download_animation(url)
       #print(f"T-Pose successfully downloaded.")
-
-      # Emit the 'finished' signal to let the UI know that worker is done.
-      self.finished.emit()
       return
 
     # DOWNLOAD MODE: ALL
@@ -101,31 +242,23 @@ class MixamoDownloader(QtCore.QObject):
       # Search for animation IDs according to the query entered by the user.
       anim_data = self.get_queried_animations_data(self.query)
 
+    # Keep track of the total amount of tasks, as it may grow when an
+    # animation is expanded into several parameter variants.
+    self.total = len(anim_data)
+
     # The following code will be run for both the "all" and "query" modes.
     # Iterate the animation IDs and names dictionary.
     for anim_id, anim_name in anim_data.items():
 
       # Check if the 'Stop' button has been pressed in the UI.
       if self.stop:
-
-        # Let the thread know that the worker has finished the job.
-        # Stopping the function here with a return makes the thread actually
-        # finish. Without it, the thread would remain active until every line
-        # of this method is done.
-        self.finished.emit()
         return
 
-      # Build the animation payload, export and download it to disk.
-      anim_payload = self.build_animation_payload(character_id, anim_id)
-      url = self.export_animation(character_id, anim_payload)
-
       #print(f"Downloading {anim_name}...")
-      self.download_animation(url)
+      # Export and download every variant of the animation.
+      self.download_animation_variants(character_id, anim_id)
 
     #print("DOWNLOAD COMPLETE.")
-    # Emit the 'finished' signal to let the UI know that worker is done.
-    self.finished.emit()
-    return
 
   def get_primary_character_id(self):
     """Get the primary character ID (i.e: the one selected by the user).
@@ -174,6 +307,7 @@ class MixamoDownloader(QtCore.QObject):
     # Update the 'product_name' variable so that it can be used later
     # as the FBX file name (see the 'download_animation' method).
     self.product_name = character_name
+    self.anim_id = None
 
     # Build the payload.
     payload = {
@@ -270,8 +404,8 @@ class MixamoDownloader(QtCore.QObject):
     
     return anim_data
 
-  def build_animation_payload(self, character_id, anim_id):
-    """Build the payload that will be used to export the animation.
+  def download_animation_variants(self, character_id, anim_id):
+    """Export and download every variant of an animation.
 
     :param character_id: Primary character ID
     :type character_id: str
@@ -279,20 +413,143 @@ class MixamoDownloader(QtCore.QObject):
     :param anim_id: Animation ID
     :type anim_id: str
 
-    :return: Payload that will be used to export the animation
-    :rtype: str
+    Errors affecting a single animation or variant (e.g. a failed
+    download) don't stop the rest of them. An expired access token does,
+    as every other request would fail as well.
+
+    :return: True if every variant was downloaded, False if any of them
+      failed or the download was stopped by the user
+    :rtype: bool
+    """
+    # Check if the 'Stop' button has been pressed in the UI.
+    if self.stop:
+      return False
+
+    # Get the animation details just once, no matter how many variants
+    # are going to be exported from them.
+    try:
+      anim_details = self.get_animation_details(character_id, anim_id)
+      variants = self.get_animation_variants(anim_details)
+    except (requests.RequestException, ValueError, KeyError):
+      return False
+
+    # Let the UI know about the extra tasks added by the variants.
+    if len(variants) > 1:
+      self.total += len(variants) - 1
+      self.total_tasks.emit(self.total)
+
+    success = True
+
+    for variant in variants:
+      if self.stop:
+        return False
+
+      # Build the animation payload, export and download it to disk.
+      # Keep going with the rest of variants if one of them fails.
+      try:
+        anim_payload = self.build_animation_payload(
+          character_id, anim_id, anim_details, variant)
+        url = self.export_animation(character_id, anim_payload)
+
+        if not self.download_animation(url):
+          success = False
+
+      except (requests.RequestException, ValueError, KeyError):
+        success = False
+
+    return success
+
+  def get_animation_details(self, character_id, anim_id):
+    """Get the details of an animation applied to the primary character.
+
+    :param character_id: Primary character ID
+    :type character_id: str
+
+    :param anim_id: Animation ID
+    :type anim_id: str
+
+    :return: Animation details (description, type, gms_hash...)
+    :rtype: dict
     """
     # Send a GET request to the animation-on-character endpoint.
     response = session.get(
       f"https://www.mixamo.com/api/v1/products/{anim_id}?similar=0&character_id={character_id}",
       headers=HEADERS)
 
+    # Stop here if the access token has expired in the middle of the download.
+    self.check_token(response)
+
+    return response.json()
+
+  def get_animation_variants(self, anim_details):
+    """Expand the parameter grid into the variants an animation supports.
+
+    Only the parameters that the animation actually has are swept (names
+    are matched case-insensitively, as the grid names are lower-cased),
+    following the order in which they appear in its 'gms_hash'. This keeps
+    the variant names deterministic.
+
+    :param anim_details: Animation details
+    :type anim_details: dict
+
+    :return: List of {param name: value} dictionaries. It contains a single
+      None item if no variants apply, meaning the default values are used.
+    :rtype: list
+    """
+    # Pair every parameter of the animation with the values to sweep.
+    names = []
+    values = []
+
+    for param in anim_details["details"]["gms_hash"]["params"]:
+      param_values = self.variant_grid.get(str(param[0]).lower())
+
+      if param_values:
+        names.append(param[0])
+        values.append(param_values)
+
+    if not names:
+      return [None]
+
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+  def build_animation_payload(self, character_id, anim_id, anim_details=None,
+                              variant=None):
+    """Build the payload that will be used to export the animation.
+
+    :param character_id: Primary character ID
+    :type character_id: str
+
+    :param anim_id: Animation ID
+    :type anim_id: str
+
+    :param anim_details: Animation details. If not given, they'll be
+      retrieved from Mixamo.
+    :type anim_details: dict
+
+    :param variant: Parameter values that override the default ones
+    :type variant: dict
+
+    :return: Payload that will be used to export the animation
+    :rtype: str
+    """
+    if anim_details is None:
+      anim_details = self.get_animation_details(character_id, anim_id)
+
+    # Keep the animation ID so that it can be stored in the archive index.
+    self.anim_id = anim_id
+
     # Get the animation description (make it public so that we can use it later).
     # We're using the description because some anims have the same name and this
     # would cause them to be overriden when downloading to disk.
-    self.product_name = response.json()["description"]
+    self.product_name = anim_details["description"]
     # Get the animation type.
-    _type = response.json()["type"]
+    _type = anim_details["type"]
+
+    # Add the variant values to the name so that every variant gets
+    # its own file, e.g. "Walking (Emotion 50, Overdrive 0)".
+    if variant:
+      suffix = ", ".join(f"{name} {val}" for name, val in variant.items())
+      self.product_name = f"{self.product_name} ({suffix})"
 
     # Set the animation preferences.
     # NOTE: Changing the 'skin' key to True doesn't seem to have any effect.
@@ -303,12 +560,15 @@ class MixamoDownloader(QtCore.QObject):
       "reducekf": "0"
     }
 
-    # Get the original 'gms_hash' property.
-    gms_hash = response.json()["details"]["gms_hash"]
+    # Get a copy of the original 'gms_hash' property, as the same details
+    # may be reused to build the payload of several variants.
+    gms_hash = copy.deepcopy(anim_details["details"]["gms_hash"])
 
-    # Read its 'params' and store their values.
+    # Read its 'params' and store their values (or the variant ones).
     gms_hash_params = gms_hash["params"]
-    param_values = [int(param[-1]) for param in gms_hash_params]       
+    variant = variant or {}
+    param_values = [int(variant.get(param[0], param[-1]))
+                    for param in gms_hash_params]
 
     # Build a 'params' string depending on how many params the animation has.
     # For example, if there are two params (Overdrive and Emotion), and their
@@ -347,7 +607,8 @@ class MixamoDownloader(QtCore.QObject):
     :param payload: Payload that will be used to export the animation
     :type payload: str
 
-    :return: URL to download the animation
+    :return: URL to download the animation (None if the export failed,
+      timed out or was stopped by the user)
     :rtype: str
     """
     # Send a POST request to the export animations endpoint.
@@ -358,8 +619,16 @@ class MixamoDownloader(QtCore.QObject):
     # Initialize a 'status' flag.
     status = None
 
+    # Give up if the export takes too long.
+    deadline = time.time() + EXPORT_TIMEOUT
+
     # Check if the process is completed and retry if it's not.
     while status != "completed":
+      # Stop waiting if the export failed, took too long, or the 'Stop'
+      # button has been pressed in the UI.
+      if status in ("failed", "error") or self.stop or time.time() > deadline:
+        return None
+
       # Add some delay between retries to avoid overflow. 
       time.sleep(1)
 
@@ -381,14 +650,26 @@ class MixamoDownloader(QtCore.QObject):
 
     :param url: URL to download the animation
     :type url: str
+
+    :return: True if the animation has been saved, False otherwise
+    :rtype: bool
     """
     # Ensure this code is only run if a URL has been retrieved.
     if url:
       # Send a GET request to the download link.
       response = session.get(url)
 
+      # Don't save error pages as if they were FBX files.
+      response.raise_for_status()
+
+      # Hand the FBX over to the archive writer instead of saving it
+      # as a separate file. Compression happens on its worker threads.
+      if self.archive:
+        self.archive.add(
+          f"{self.product_name}.fbx", response.content, self.anim_id)
+
       # Check if the output folder exists on disk. If it doesn't, create it.
-      if self.path:
+      elif self.path:
         if not os.path.exists(self.path):
           os.mkdir(self.path)
 
@@ -404,3 +685,448 @@ class MixamoDownloader(QtCore.QObject):
       self.current_task.emit(self.task)
       # Increase the counter by one.
       self.task += 1
+
+      return True
+
+    return False
+
+  def close_archive(self):
+    """Write the pending archive (if any) and its index to disk."""
+    if self.archive:
+      try:
+        self.archive.close()
+      finally:
+        self.archive = None
+
+  def sync_library(self):
+    """Keep the output folder in sync with Mixamo until the user stops it.
+
+    Every pass compares the Mixamo catalog against a manifest stored in
+    the output folder, and only downloads animations that are new or have
+    changed. Catalog pages are requested with the ETag/Last-Modified
+    values from the previous pass, so unchanged pages are not downloaded
+    again.
+
+    The manifest is kept per character and per profile (i.e: the parameter
+    variants), so switching the primary character in Mixamo, or the
+    variants in the UI, makes the next pass fetch what's missing for it.
+
+    If the access token expires, the UI is asked for a new one through the
+    'token_expired' signal. If no new token arrives, the sync stops and
+    reports that the user has to log in again.
+
+    The health of the sync (last pass, errors, pending animations...) is
+    emitted through the 'sync_status' signal and written to a JSON file
+    in the output folder so it can be monitored from outside.
+    """
+    # The manifest is loaded on the first pass that can read it.
+    manifest = None
+
+    # Number of passes in a row that downloaded nothing.
+    idle_passes = 0
+
+    # Whether the access token has just been refreshed.
+    refreshed = False
+
+    # Metrics that describe the health of the sync.
+    status = {
+      "state": "starting",
+      "last_sync": None,
+      "last_success": None,
+      "last_error": None,
+      "consecutive_errors": 0,
+      "catalog_size": 0,
+      "downloaded": 0,
+      "failed": 0,
+      "pending": 0,
+      "next_sync": None,
+    }
+
+    while not self.stop:
+      status["state"] = "syncing"
+      status["next_sync"] = None
+      self.update_sync_status(status)
+      downloaded = 0
+
+      try:
+        if manifest is None:
+          manifest = self.load_manifest(status)
+
+        downloaded = self.sync_once(manifest, status)
+
+      # Retrying with an expired token would fail forever, so ask the UI
+      # for a new one, and give up if it doesn't work.
+      except AuthenticationError as error:
+        if not refreshed and self.refresh_token():
+          refreshed = True
+          continue
+
+        status["state"] = "login required"
+        status["last_error"] = (
+          f"{error}. Log into Mixamo again and restart the sync.")
+        status["consecutive_errors"] += 1
+        status["last_sync"] = self.timestamp()
+        break
+
+      # Problems such as Mixamo being down or a full disk shouldn't stop
+      # the sync, so just back off and try again later.
+      except (requests.RequestException, OSError, ValueError,
+              KeyError) as error:
+        status["state"] = "error"
+        status["last_error"] = f"{type(error).__name__}: {error}"
+        status["consecutive_errors"] += 1
+
+      else:
+        # A pass stopped halfway by the user isn't a successful one. Its
+        # remaining animations are still counted in 'pending'.
+        if self.stop:
+          status["state"] = "stopped"
+        else:
+          status["state"] = "idle"
+          status["last_success"] = self.timestamp()
+          status["consecutive_errors"] = 0
+
+      # The token worked (or the pass failed for some other reason), so
+      # allow refreshing it again the next time it expires.
+      refreshed = False
+
+      status["last_sync"] = self.timestamp()
+
+      # Check again soon if there were changes, and wait longer and longer
+      # (15 min, 30 min, 1h...) while there aren't.
+      if downloaded:
+        idle_passes = 0
+
+      interval = min(SYNC_INTERVAL * 2 ** idle_passes, SYNC_MAX_INTERVAL)
+
+      if not downloaded and interval < SYNC_MAX_INTERVAL:
+        idle_passes += 1
+
+      status["next_sync"] = self.timestamp(interval)
+      self.update_sync_status(status)
+
+      # Sleep in small steps so that the 'Stop' button is still responsive.
+      for _ in range(interval):
+        if self.stop:
+          break
+        time.sleep(1)
+
+    if status["state"] != "login required":
+      status["state"] = "stopped"
+
+    status["next_sync"] = None
+    self.update_sync_status(status)
+
+  def sync_once(self, manifest, status):
+    """Download the animations that are new or changed since the last pass.
+
+    Animations whose export or download fails are left pending, so they're
+    retried on the next pass.
+
+    :param manifest: Sync manifest (updated in place and saved to disk)
+    :type manifest: dict
+
+    :param status: Sync metrics (updated in place)
+    :type status: dict
+
+    :return: Number of animations downloaded
+    :rtype: int
+    """
+    # Send a GET request to the primary character endpoint.
+    response = session.get(
+      f"https://www.mixamo.com/api/v1/characters/primary",
+      headers=HEADERS)
+
+    self.check_token(response)
+    response.raise_for_status()
+
+    character_id = response.json().get("primary_character_id")
+
+    # Without a character ID there's probably a problem with the token.
+    if not character_id:
+      raise AuthenticationError("Couldn't get the primary character")
+
+    # Get the catalog, reusing every page that hasn't changed.
+    pages = manifest.setdefault("catalog", {})
+    catalog = self.get_catalog(pages)
+    status["catalog_size"] = len(catalog)
+
+    # Get what's already been downloaded for this character and profile.
+    profile = json.dumps(self.variant_grid, sort_keys=True)
+    downloaded = manifest.setdefault("downloaded", {}).setdefault(
+      f"{character_id}|{profile}", {})
+
+    pending = [anim_id for anim_id, fingerprint in catalog.items()
+               if downloaded.get(anim_id) != fingerprint]
+
+    status["downloaded"] = 0
+    status["failed"] = 0
+    status["pending"] = len(pending)
+    self.write_json(SYNC_MANIFEST, manifest)
+
+    if not pending:
+      return 0
+
+    self.update_sync_status(status)
+
+    # Reset the progress bar for this pass.
+    self.task = 1
+    self.total = len(pending)
+    self.total_tasks.emit(self.total)
+
+    def record(anim_id):
+      # Save the manifest after every animation, so that nothing is
+      # downloaded twice if the program is closed in the middle of a pass.
+      downloaded[anim_id] = catalog[anim_id]
+      status["downloaded"] += 1
+      status["pending"] -= 1
+      self.write_json(SYNC_MANIFEST, manifest)
+
+    # Animations fully downloaded into an archive that isn't sealed yet.
+    # They're only recorded once the archive is safely written to disk,
+    # otherwise closing the program would lose them for good.
+    unsealed = set()
+
+    def record_sealed(anim_ids):
+      for anim_id in set(anim_ids) & unsealed:
+        if self.archive.is_sealed(anim_id):
+          unsealed.discard(anim_id)
+          record(anim_id)
+
+    # Every pass gets its own archives so that previous ones aren't
+    # overwritten.
+    if self.archive_format:
+      self.archive = ArchiveWriter(
+        self.path, self.archive_format,
+        prefix=time.strftime("animations-%Y%m%d-%H%M%S"),
+        on_seal=record_sealed)
+
+    try:
+      for anim_id in pending:
+        if self.stop:
+          break
+
+        # Only animations that have been fully downloaded are recorded.
+        # The rest stay pending and are retried on the next pass.
+        if not self.download_animation_variants(character_id, anim_id):
+          if not self.stop:
+            status["failed"] += 1
+          continue
+
+        if self.archive and not self.archive.is_sealed(anim_id):
+          unsealed.add(anim_id)
+        else:
+          record(anim_id)
+
+    finally:
+      self.close_archive()
+
+    return status["downloaded"]
+
+  def load_manifest(self, status):
+    """Read the sync manifest from the output folder.
+
+    If the manifest is corrupt (i.e: it isn't valid JSON or doesn't have
+    the expected structure), it's renamed to '*.corrupt' and the sync
+    starts over with an empty one.
+
+    :param status: Sync metrics (updated in place)
+    :type status: dict
+
+    :return: Sync manifest
+    :rtype: dict
+    """
+    try:
+      manifest = self.read_json(SYNC_MANIFEST)
+
+      if not isinstance(manifest, dict) or not all(
+          isinstance(manifest.get(key, {}), dict)
+          for key in ("catalog", "downloaded")):
+        raise ValueError("Unexpected manifest structure")
+
+      return manifest
+
+    except ValueError as error:
+      file_path = os.path.join(self.path or "", SYNC_MANIFEST)
+      os.replace(file_path, f"{file_path}.corrupt")
+
+      status["last_error"] = (
+        f"Corrupt manifest moved to {SYNC_MANIFEST}.corrupt: {error}")
+
+      return {}
+
+  def check_token(self, response):
+    """Raise an AuthenticationError if Mixamo has rejected the token.
+
+    :param response: Response from the Mixamo API
+    :type response: requests.Response
+    """
+    if response.status_code in (401, 403):
+      raise AuthenticationError("The access token has expired")
+
+  def refresh_token(self):
+    """Ask the UI for a new access token and wait for it.
+
+    :return: True if a different token has been received
+    :rtype: bool
+    """
+    old_token = HEADERS.get("Authorization")
+    self.token_expired.emit()
+
+    for _ in range(TOKEN_REFRESH_TIMEOUT):
+      if self.stop:
+        return False
+
+      time.sleep(1)
+
+      if HEADERS.get("Authorization") != old_token:
+        return True
+
+    return False
+
+  def get_catalog(self, pages):
+    """Get the ID and fingerprint of every animation in Mixamo.
+
+    Pages are requested with the ETag/Last-Modified headers from the
+    previous pass. If Mixamo answers '304 Not Modified', the cached page
+    is used instead.
+
+    :param pages: Cached catalog pages (updated in place)
+    :type pages: dict
+
+    :return: Animation IDs and their fingerprints
+    :rtype: dict
+    """
+    catalog = {}
+    page_num = 1
+    num_pages = 1
+
+    while page_num <= num_pages:
+      cached = pages.get(str(page_num), {})
+
+      # Make the request conditional if this page has been read before.
+      headers = dict(HEADERS)
+      if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+      if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+      params = {
+        "limit":96,
+        "page":page_num,
+        "type":"Motion"}
+
+      response = session.get("https://www.mixamo.com/api/v1/products",
+        headers=headers,
+        params=params)
+
+      if response.status_code == 304 and cached:
+        page = cached
+
+      else:
+        self.check_token(response)
+        response.raise_for_status()
+        data = response.json()
+
+        page = {
+          "etag": response.headers.get("ETag"),
+          "last_modified": response.headers.get("Last-Modified"),
+          "num_pages": data["pagination"]["num_pages"],
+          "animations": {
+            animation["id"]: self.get_fingerprint(animation)
+            for animation in data["results"]},
+        }
+        pages[str(page_num)] = page
+
+      catalog.update(page["animations"])
+      num_pages = page["num_pages"]
+      page_num += 1
+
+    # Forget pages that no longer exist (e.g. animations were removed).
+    for key in list(pages):
+      if int(key) > num_pages:
+        del pages[key]
+
+    return catalog
+
+  def get_fingerprint(self, animation):
+    """Get a short hash that changes whenever an animation changes.
+
+    :param animation: Animation as returned by the products endpoint
+    :type animation: dict
+
+    :return: Animation fingerprint
+    :rtype: str
+    """
+    fields = {key: animation.get(key) for key in SYNC_FINGERPRINT_KEYS}
+    data = json.dumps(fields, sort_keys=True).encode()
+
+    return hashlib.sha1(data).hexdigest()[:16]
+
+  def update_sync_status(self, status):
+    """Emit the sync metrics and save them to disk.
+
+    :param status: Sync metrics
+    :type status: dict
+    """
+    self.sync_status.emit(dict(status))
+
+    # Failing to write the health file shouldn't stop the sync, as the UI
+    # still gets the metrics through the signal.
+    try:
+      self.write_json(SYNC_HEALTH, status)
+    except OSError:
+      pass
+
+  def timestamp(self, delay=0):
+    """Get the current time (plus an optional delay) in ISO format.
+
+    :param delay: Seconds to add to the current time
+    :type delay: int
+
+    :return: ISO 8601 timestamp
+    :rtype: str
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    return (now + datetime.timedelta(seconds=delay)).isoformat(
+      timespec="seconds")
+
+  def read_json(self, file_name):
+    """Read a JSON file from the output folder.
+
+    :param file_name: File name
+    :type file_name: str
+
+    :return: File content (or an empty dictionary if there's no file)
+    :rtype: dict
+    """
+    file_path = os.path.join(self.path or "", file_name)
+
+    if not os.path.exists(file_path):
+      return {}
+
+    with open(file_path, "r") as file:
+      return json.load(file)
+
+  def write_json(self, file_name, data):
+    """Write a JSON file to the output folder.
+
+    The file is written to a temporary path first and then renamed, so it
+    never ends up half-written if the program is closed.
+
+    :param file_name: File name
+    :type file_name: str
+
+    :param data: Content to be written
+    :type data: dict
+    """
+    if self.path and not os.path.exists(self.path):
+      os.makedirs(self.path)
+
+    file_path = os.path.join(self.path or "", file_name)
+
+    with open(f"{file_path}.tmp", "w") as file:
+      json.dump(data, file, indent=2)
+
+    os.replace(f"{file_path}.tmp", file_path)
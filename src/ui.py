@@ -5,8 +5,10 @@ import json
 from PySide2 import QtCore, QtGui, QtWebEngineWidgets, QtWidgets
 
 # Local modules
+from archiver import ZSTD_AVAILABLE
 from downloader import HEADERS
 from downloader import MixamoDownloader
+from downloader import parse_variant_grid
 from webpage import CustomWebPage
 
 
@@ -47,6 +49,11 @@ class MixamoDownloaderUI(QtWidgets.QMainWindow):
         # method in this class in order to get its value.
         page.retrieved_token.connect(self.apply_token)
 
+        # Whether the user has asked to start a download. Tokens retrieved
+        # for any other reason (e.g. to refresh an expired one) must not
+        # launch a new download.
+        self.start_requested = False
+
         # Create the central widget and its layout.
         central_widget = QtWidgets.QWidget()
 
@@ -79,16 +86,20 @@ class MixamoDownloaderUI(QtWidgets.QMainWindow):
 
         self.rb_tpose = QtWidgets.QRadioButton("T-Pose (with skin)")
 
+        self.rb_sync = QtWidgets.QRadioButton("Keep library in sync")
+
         # The line edit is to be enabled only when using the query option.
         self.rb_query.toggled.connect(lambda: self.le_query.setEnabled(True))
         self.rb_all.toggled.connect(lambda: self.le_query.setEnabled(False))
         self.rb_tpose.toggled.connect(lambda: self.le_query.setEnabled(False))
+        self.rb_sync.toggled.connect(lambda: self.le_query.setEnabled(False))
 
         # Add the radio buttons and line edit to the download options layout.
         anim_opt_lyt.addWidget(self.rb_all)
         anim_opt_lyt.addWidget(self.rb_query)
         anim_opt_lyt.addWidget(self.le_query)
         anim_opt_lyt.addWidget(self.rb_tpose)
+        anim_opt_lyt.addWidget(self.rb_sync)
 
         # Add another horizontal layout to the footer.
         # This layout will contain the Output Folder group box.
@@ -121,9 +132,47 @@ class MixamoDownloaderUI(QtWidgets.QMainWindow):
         # Add the group box to its corresponding layout.
         output_dir_lyt.addWidget(gbox_output)
 
+        # Create a group box where users can choose how files are saved:
+        # as separate FBX files or streamed into rolling archives.
+        gbox_format = QtWidgets.QGroupBox("Output Format")
+        gbox_format.setMaximumHeight(70)
+
+        gbox_format_lyt = QtWidgets.QHBoxLayout()
+        gbox_format.setLayout(gbox_format_lyt)
+
+        # Each item stores the archive format as its data (None = no archive).
+        self.cb_format = QtWidgets.QComboBox()
+        self.cb_format.addItem("FBX files", None)
+        self.cb_format.addItem("ZIP archives", "zip")
+
+        # The TAR.ZST option is only available if zstd can be imported.
+        if ZSTD_AVAILABLE:
+            self.cb_format.addItem("TAR.ZST archives", "tar.zst")
+
+        gbox_format_lyt.addWidget(self.cb_format)
+
+        # Add the group box to its corresponding layout.
+        output_dir_lyt.addWidget(gbox_format)
+
+        # Create a group box where users can enter a grid of parameter
+        # values. Every animation will be exported once per combination.
+        gbox_variants = QtWidgets.QGroupBox("Parameter Variants")
+        gbox_variants.setMaximumHeight(70)
+
+        gbox_variants_lyt = QtWidgets.QHBoxLayout()
+        gbox_variants.setLayout(gbox_variants_lyt)
+
+        self.le_variants = QtWidgets.QLineEdit()
+        self.le_variants.setPlaceholderText(
+            "e.g. Emotion=0,50,100; Overdrive=0,50")
+        gbox_variants_lyt.addWidget(self.le_variants)
+
+        # Add the group box to its corresponding layout.
+        output_dir_lyt.addWidget(gbox_variants)
+
         # Create the button that will launch the download process.
         self.get_btn = QtWidgets.QPushButton('Start download')
-        self.get_btn.clicked.connect(self.get_access_token)
+        self.get_btn.clicked.connect(self.start_download)
 
         # Add the button to the footer layout.
         footer_lyt.addWidget(self.get_btn)
@@ -149,6 +198,11 @@ class MixamoDownloaderUI(QtWidgets.QMainWindow):
         # Set this widget as the central one for the Main Window.
         self.setCentralWidget(central_widget)
 
+    def start_download(self):
+        """Retrieve the access token and launch the download with it."""
+        self.start_requested = True
+        self.get_access_token()
+
     def get_access_token(self):
         """Enter a JavaScript command to retrieve the Mixamo access token.
 
@@ -173,13 +227,26 @@ class MixamoDownloaderUI(QtWidgets.QMainWindow):
 
         This method is invoked as soon as the access token is sent through
         the QWebEnginePage signal, so we'll use it to launch the downloader
-        as well.
+        as well if the user has asked for it.
 
         :param token: Mixamo Access Token
         :type token: str
         """
         HEADERS["Authorization"] = f"Bearer {token}"
-        self.run_downloader()
+
+        # Otherwise, the worker is already running and just needed a new
+        # token.
+        if self.start_requested:
+            self.run_downloader()
+
+    def refresh_access_token(self):
+        """Get a new access token for the running worker.
+
+        This method is invoked when the worker finds that the current token
+        has expired (e.g. when keeping the library in sync for a long time).
+        The new token will only update the HTTP Request Headers.
+        """
+        self.get_access_token()
 
     def run_downloader(self):
         """Wrapper method that sets everything up for the download.
@@ -188,16 +255,31 @@ class MixamoDownloaderUI(QtWidgets.QMainWindow):
         freezing. This also allows the progress bar to the updated on
         every download, giving the user an appropriate experience.
         """
-        # Create a QThread instance.
-        self.thread = QtCore.QThread()
+        # The download requested by the user is being launched now.
+        self.start_requested = False
 
-        # Get the download mode, query (if any) and the output folder path.
+        # Get the download mode, query (if any), the output folder path,
+        # the archive format (if any) and the parameter variants (if any).
         mode = self.get_mode()
         query = self.le_query.text()
         path = self.le_path.text()
+        archive_format = self.cb_format.currentData()
+
+        try:
+            variant_grid = parse_variant_grid(self.le_variants.text())
+        except ValueError as error:
+            QtWidgets.QMessageBox.warning(
+                self, "Parameter Variants",
+                f"{error}\n\n"
+                "Variants should look like: Emotion=0,50,100; Overdrive=0,50")
+            return
+
+        # Create a QThread instance.
+        self.thread = QtCore.QThread()
 
         # Create a MixamoDownloader instance and move it to the new thread.
-        self.worker = MixamoDownloader(path, mode, query)
+        self.worker = MixamoDownloader(
+            path, mode, query, archive_format, variant_grid)
         self.worker.moveToThread(self.thread)
 
         # As soon as the thread is started, the run method on the worker
@@ -217,6 +299,10 @@ class MixamoDownloaderUI(QtWidgets.QMainWindow):
         # Once the thread is closed, restore buttons to its default state.
         self.thread.finished.connect(lambda: self.stop_btn.setEnabled(False))
         self.thread.finished.connect(lambda: self.get_btn.setEnabled(True))
+        # Make sure that no token arriving after the worker is done (e.g.
+        # a late refresh) launches a download the user didn't ask for.
+        self.thread.finished.connect(
+            lambda: setattr(self, "start_requested", False))
 
         # Read signals from the worker that allows us to set the progress bar.
         # The 'total_tasks' signal emits the amount of items to be downloaded.
@@ -224,6 +310,11 @@ class MixamoDownloaderUI(QtWidgets.QMainWindow):
         self.worker.total_tasks.connect(self.set_progress_bar)
         self.worker.current_task.connect(self.update_progress_bar)
 
+        # The 'sync_status' signal emits the health of the library sync.
+        self.worker.sync_status.connect(self.show_sync_status)
+        # The 'token_expired' signal asks for a new access token.
+        self.worker.token_expired.connect(self.refresh_access_token)
+
         # Start the thread.
         self.thread.start()
 
@@ -249,6 +340,27 @@ class MixamoDownloaderUI(QtWidgets.QMainWindow):
         """
         self.progress_bar.setValue(step)
 
+    def show_sync_status(self, status):
+        """Show the state of the library sync in the status bar.
+
+        The 'sync_status' signal from the worker emits a dictionary of
+        metrics every time the sync state changes.
+
+        :param status: Sync metrics
+        :type status: dict
+        """
+        message = (f"Sync: {status['state']} | "
+                   f"Last sync: {status['last_sync'] or '-'} | "
+                   f"Downloaded: {status['downloaded']} | "
+                   f"Failed: {status['failed']} | "
+                   f"Pending: {status['pending']} | "
+                   f"Next sync: {status['next_sync'] or '-'}")
+
+        if status["last_error"]:
+            message += f" | Last error: {status['last_error']}"
+
+        self.statusBar().showMessage(message)
+
     def stop_download(self):
         """Send a flag to the worker to let him know that it should stop.
 
@@ -278,3 +390,5 @@ class MixamoDownloaderUI(QtWidgets.QMainWindow):
             return "query"
         elif self.rb_tpose.isChecked():
             return "tpose"
+        elif self.rb_sync.isChecked():
+            return "sync"